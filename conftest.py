@@ -0,0 +1,11 @@
+import os
+import tempfile
+
+# test_alexa_request.py é um script manual que exige o servidor rodando
+collect_ignore = ["test_alexa_request.py"]
+
+# Bancos e arquivos das instâncias globais ficam fora do repositório durante os testes
+_tmp_dir = tempfile.mkdtemp(prefix="alexa-skill-tests-")
+os.environ.setdefault("USER_DB_PATH", os.path.join(_tmp_dir, "users.db"))
+os.environ.setdefault("SESSION_DB_PATH", os.path.join(_tmp_dir, "sessions.db"))
+os.environ.setdefault("TRACE_FILE", os.path.join(_tmp_dir, "traces.jsonl"))
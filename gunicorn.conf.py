@@ -0,0 +1,17 @@
+# Configuração do gunicorn (carregada via --config no Dockerfile)
+
+import threading
+
+
+def post_worker_init(worker):
+    """
+    Aquece a conexão com o n8n em cada worker assim que ele inicia, para que
+    a primeira requisição atendida por qualquer worker não pague TCP/TLS.
+    Uma falha aqui nunca pode impedir o worker de subir.
+    """
+    try:
+        from src.n8n_integration import n8n_integration
+
+        threading.Thread(target=n8n_integration.warm_connection, name='n8n-warmup', daemon=True).start()
+    except Exception as e:
+        worker.log.warning(f"Não foi possível aquecer a conexão com o n8n: {str(e)}")
@@ -1,9 +1,9 @@
 from flask import Flask, request, jsonify
 from src.routes.alexa import alexa_bp
-from src.services.n8n_integration import send_to_n8n # Importe a função send_to_n8n
 
 # Importe o blueprint de usuário
 from src.routes.user import user_bp
+from src.models.user import user_repository
 
 # Se você precisa de 'db' de src.models.user, importe-o aqui.
 # Se não, a linha abaixo pode ser removida ou comentada se você não for usar um ORM.
@@ -15,6 +15,12 @@ app = Flask(__name__)
 app.register_blueprint(alexa_bp, url_prefix='/alexa')
 app.register_blueprint(user_bp, url_prefix='/api/user') # Exemplo de prefixo para rotas de usuário
 
+# Pré-carregar no cache os usuários ativos para que a busca por turno não vá ao disco
+try:
+    user_repository.preload_active_users()
+except Exception as e:
+    app.logger.warning(f"Não foi possível pré-carregar usuários: {str(e)}")
+
 @app.route('/')
 def home():
     return "Alexa Skill Backend is running!"
@@ -0,0 +1,48 @@
+# src/models/database.py
+
+# Base comum para os repositórios persistidos em SQLite no volume ./data.
+# O arquivo é compartilhado por todos os workers do gunicorn; cada thread
+# usa a sua própria conexão.
+
+import os
+import sqlite3
+import threading
+
+
+class SQLiteStore:
+    """
+    Repositório SQLite com uma conexão por thread e criação preguiçosa do schema
+    """
+
+    # Script SQL executado na primeira conexão (definido pelas subclasses)
+    SCHEMA = ""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._schema_lock = threading.Lock()
+        self._schema_ready = False
+
+    def _connect(self) -> sqlite3.Connection:
+        """
+        Retorna a conexão SQLite da thread atual, criando o schema se necessário
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            directory = os.path.dirname(self.db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=5)
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        if not self._schema_ready:
+            self._init_schema(conn)
+        return conn
+
+    def _init_schema(self, conn: sqlite3.Connection):
+        with self._schema_lock:
+            if self._schema_ready:
+                return
+            conn.executescript("PRAGMA journal_mode=WAL;\n" + self.SCHEMA)
+            conn.commit()
+            self._schema_ready = True
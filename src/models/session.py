@@ -0,0 +1,100 @@
+# src/models/session.py
+
+# Resultados do prefetch de início de sessão (ação 'session_start' do n8n),
+# guardados em SQLite no volume ./data para que qualquer worker do gunicorn
+# que receba a primeira pergunta da sessão possa usá-los.
+
+import json
+import logging
+import os
+import time
+from typing import Dict, Any, Optional
+from src.models.database import SQLiteStore
+
+logger = logging.getLogger(__name__)
+
+
+class SessionPrefetchStore(SQLiteStore):
+    """
+    Armazena o prefetch de cada sessão até ser consumido ou expirar
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS session_prefetch (
+            session_id TEXT PRIMARY KEY,
+            payload TEXT NOT NULL,
+            expires_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_session_prefetch_expires_at ON session_prefetch (expires_at);
+    """
+
+    def __init__(self, db_path: Optional[str] = None, ttl: Optional[int] = None):
+        db_path = db_path or os.getenv('SESSION_DB_PATH', os.path.join('data', 'sessions.db'))
+        self.ttl = ttl if ttl is not None else int(os.getenv('SESSION_PREFETCH_TTL', '600'))  # em segundos
+        super().__init__(db_path)
+
+    def put(self, session_id: str, result: Dict[str, Any]):
+        """
+        Guarda o resultado do prefetch da sessão e remove os expirados
+        """
+        now = time.time()
+        conn = self._connect()
+        conn.execute("DELETE FROM session_prefetch WHERE expires_at < ?", (now,))
+        conn.execute(
+            "INSERT OR REPLACE INTO session_prefetch (session_id, payload, expires_at) VALUES (?, ?, ?)",
+            (session_id, json.dumps(result), now + self.ttl)
+        )
+        conn.commit()
+
+    def pop(self, session_id: Optional[str]) -> Optional[Dict[str, Any]]:
+        """
+        Retorna e remove o prefetch da sessão (usado apenas na primeira pergunta)
+
+        Returns:
+            Resultado do prefetch ou None se não houver ou estiver expirado
+        """
+        if not session_id:
+            return None
+
+        # Leitura simples primeiro: na maioria dos turnos não há prefetch e
+        # nenhum lock de escrita deve ser disputado entre os workers
+        conn = self._connect()
+        row = conn.execute(
+            "SELECT payload, expires_at FROM session_prefetch WHERE session_id = ?",
+            (session_id,)
+        ).fetchone()
+        if row is None:
+            return None
+
+        # Só quem conseguir remover a linha usa o prefetch (consumo único entre workers)
+        try:
+            deleted = conn.execute(
+                "DELETE FROM session_prefetch WHERE session_id = ?", (session_id,)
+            ).rowcount
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+        if deleted != 1 or row['expires_at'] < time.time():
+            return None
+
+        try:
+            return json.loads(row['payload'])
+        except ValueError:
+            logger.warning(f"Prefetch inválido para a sessão {session_id}")
+            return None
+
+    def delete(self, session_id: Optional[str]):
+        """
+        Remove o prefetch ao fim da sessão
+        """
+        if not session_id:
+            return
+        conn = self._connect()
+        conn.execute("DELETE FROM session_prefetch WHERE session_id = ?", (session_id,))
+        conn.commit()
+
+
+# Instância global para uso em toda a aplicação
+session_prefetch_store = SessionPrefetchStore()
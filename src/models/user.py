@@ -1,21 +1,286 @@
- # src/models/user.py
+# src/models/user.py
+
+# Este arquivo contém o modelo de usuário e o repositório de usuários
+# persistido em SQLite (volume ./data), com cache LRU em memória para que a
+# busca de preferências a cada turno da Alexa não precise ir ao disco.
+#
+# Cada worker do gunicorn tem o seu próprio cache, então as entradas expiram
+# após USER_CACHE_TTL segundos para que alterações feitas por outro worker
+# sejam vistas sem reiniciar o processo.
+
+import copy
+import json
+import logging
+import os
+import sqlite3
+from datetime import datetime, timedelta
+from typing import Dict, Any, Optional, List
+from src.cache import LRUCache
+from src.models.database import SQLiteStore
+
+logger = logging.getLogger(__name__)
+
+# Preferências padrão aplicadas quando o usuário não configurou nada
+DEFAULT_PREFERENCES = {
+    "voice_speed": "medium",
+    "default_city": None,
+    "opt_outs": []
+}
+
+
+# Valores aceitos para voice_speed (mesmos valores de <prosody rate> do SSML da Alexa)
+VOICE_SPEEDS = ("x-slow", "slow", "medium", "fast", "x-fast")
+
+
+def default_preferences() -> Dict[str, Any]:
+    """
+    Retorna uma cópia independente das preferências padrão
+    """
+    return copy.deepcopy(DEFAULT_PREFERENCES)
+
+
+def validate_preferences(preferences: Dict[str, Any]):
+    """
+    Valida as preferências recebidas antes de persistir (elas são enviadas ao n8n a cada turno)
+
+    Raises:
+        ValueError: se houver chaves desconhecidas ou valores inválidos
+    """
+    if not isinstance(preferences, dict):
+        raise ValueError("preferences deve ser um objeto")
+
+    unknown = set(preferences) - set(DEFAULT_PREFERENCES)
+    if unknown:
+        raise ValueError(f"Preferências desconhecidas: {', '.join(sorted(unknown))}")
+
+    if 'voice_speed' in preferences and preferences['voice_speed'] not in VOICE_SPEEDS:
+        raise ValueError(f"voice_speed deve ser um de: {', '.join(VOICE_SPEEDS)}")
+
+    if 'default_city' in preferences:
+        city = preferences['default_city']
+        if city is not None and (not isinstance(city, str) or len(city) > 100):
+            raise ValueError("default_city deve ser um texto de até 100 caracteres ou null")
+
+    if 'opt_outs' in preferences:
+        opt_outs = preferences['opt_outs']
+        if not isinstance(opt_outs, list) or not all(isinstance(item, str) for item in opt_outs):
+            raise ValueError("opt_outs deve ser uma lista de textos")
+
+_MISSING = object()
 
-# Este arquivo pode conter a lógica para interagir com o banco de dados
-# ou definir modelos de dados para usuários.
 
-# Exemplo simples (sem banco de dados real):
 class User:
-    def __init__(self, user_id, name):
+    def __init__(self, user_id, name=None, preferences=None):
         self.user_id = user_id
         self.name = name
+        self.preferences = copy.deepcopy(preferences or {})
 
-def get_user_by_id(user_id):
-    # Simula a busca de um usuário no banco de dados
-    if user_id == "test_user":
-        return User(user_id, "Usuário Teste")
-    return None
+    def copy(self) -> 'User':
+        return User(self.user_id, self.name, self.preferences)
+
+    def get_preferences(self) -> Dict[str, Any]:
+        """
+        Retorna as preferências do usuário mescladas com os valores padrão
+        """
+        merged = default_preferences()
+        merged.update(copy.deepcopy(self.preferences))
+        return merged
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "user_id": self.user_id,
+            "name": self.name,
+            "preferences": self.get_preferences()
+        }
+
+
+class UserRepository(SQLiteStore):
+    """
+    Repositório de usuários em SQLite com cache LRU read-through e
+    invalidação write-through
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            alexa_user_id TEXT NOT NULL,
+            name TEXT,
+            preferences TEXT NOT NULL DEFAULT '{}',
+            created_at TEXT NOT NULL,
+            updated_at TEXT NOT NULL,
+            last_seen_at TEXT
+        );
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_users_alexa_user_id ON users (alexa_user_id);
+        CREATE INDEX IF NOT EXISTS idx_users_last_seen_at ON users (last_seen_at);
+    """
+
+    def __init__(self, db_path: Optional[str] = None, cache_size: Optional[int] = None,
+                 cache_ttl: Optional[float] = None):
+        # Caminho do banco (por padrão dentro do volume ./data do docker-compose)
+        db_path = db_path or os.getenv('USER_DB_PATH', os.path.join('data', 'users.db'))
+        self.cache = LRUCache(
+            cache_size or int(os.getenv('USER_CACHE_SIZE', '1024')),
+            ttl=cache_ttl if cache_ttl is not None else float(os.getenv('USER_CACHE_TTL', '30'))
+        )
+        super().__init__(db_path)
+
+    @staticmethod
+    def _row_to_user(row: sqlite3.Row) -> User:
+        try:
+            preferences = json.loads(row['preferences'] or '{}')
+        except ValueError:
+            logger.warning(f"Preferências inválidas para o usuário {row['alexa_user_id']}")
+            preferences = {}
+        return User(row['alexa_user_id'], row['name'], preferences)
 
-# Se você estiver usando Flask-SQLAlchemy ou similar, 'db' seria definido aqui.
-# Por enquanto, vamos apenas garantir que o import não quebre.
-# db = None # Ou a sua instância de SQLAlchemy
+    def _load_user(self, conn: sqlite3.Connection, user_id: str) -> Optional[User]:
+        """
+        Lê o usuário diretamente do SQLite, sem passar pelo cache
+        """
+        row = conn.execute(
+            "SELECT alexa_user_id, name, preferences FROM users WHERE alexa_user_id = ?",
+            (user_id,)
+        ).fetchone()
+        return self._row_to_user(row) if row else None
 
+    def get_user(self, user_id: str) -> Optional[User]:
+        """
+        Busca um usuário pelo userId da Alexa (cache primeiro, depois SQLite)
+
+        Args:
+            user_id: userId da Alexa
+
+        Returns:
+            Usuário encontrado (cópia, alterações não afetam o cache) ou None
+        """
+        if not user_id:
+            return None
+
+        cached = self.cache.get(user_id, _MISSING)
+        if cached is _MISSING:
+            # Usuários inexistentes também são cacheados (até o TTL) para não consultar o banco a cada turno
+            cached = self._load_user(self._connect(), user_id)
+            self.cache.put(user_id, cached)
+
+        return cached.copy() if cached is not None else None
+
+    def get_preferences(self, user_id: str) -> Dict[str, Any]:
+        """
+        Retorna as preferências do usuário ou as preferências padrão
+        """
+        user = self.get_user(user_id)
+        if user is None:
+            return default_preferences()
+        return user.get_preferences()
+
+    @staticmethod
+    def _upsert(conn: sqlite3.Connection, user: User):
+        now = datetime.utcnow().isoformat()
+        conn.execute(
+            """
+            INSERT INTO users (alexa_user_id, name, preferences, created_at, updated_at, last_seen_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT (alexa_user_id) DO UPDATE SET
+                name = excluded.name,
+                preferences = excluded.preferences,
+                updated_at = excluded.updated_at
+            """,
+            (user.user_id, user.name, json.dumps(user.preferences), now, now, now)
+        )
+
+    def save_user(self, user: User) -> User:
+        """
+        Cria ou atualiza um usuário e atualiza o cache (write-through)
+        """
+        conn = self._connect()
+        try:
+            self._upsert(conn, user)
+            conn.commit()
+        except Exception:
+            # Em caso de falha o cache não pode ficar com um valor que não foi gravado
+            conn.rollback()
+            self.cache.invalidate(user.user_id)
+            raise
+
+        self.cache.put(user.user_id, user.copy())
+        return user
+
+    def update_preferences(self, user_id: str, preferences: Dict[str, Any], name: Optional[str] = None) -> User:
+        """
+        Mescla novas preferências às existentes e persiste o usuário
+
+        A leitura é feita direto do SQLite dentro de uma transação de escrita,
+        para não mesclar sobre uma cópia desatualizada do cache nem perder
+        alterações feitas ao mesmo tempo por outro worker.
+        """
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            current = self._load_user(conn, user_id)
+            merged = copy.deepcopy(current.preferences) if current else {}
+            merged.update(copy.deepcopy(preferences or {}))
+
+            if name is None and current is not None:
+                name = current.name
+
+            user = User(user_id, name, merged)
+            self._upsert(conn, user)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            self.cache.invalidate(user_id)
+            raise
+
+        self.cache.put(user_id, user.copy())
+        return user
+
+    def mark_seen(self, user_id: str):
+        """
+        Atualiza a data do último acesso do usuário (usada no pré-carregamento)
+        """
+        if not user_id or self.get_user(user_id) is None:
+            return
+        conn = self._connect()
+        conn.execute(
+            "UPDATE users SET last_seen_at = ? WHERE alexa_user_id = ?",
+            (datetime.utcnow().isoformat(), user_id)
+        )
+        conn.commit()
+
+    def preload_active_users(self, days: int = 7, limit: Optional[int] = None) -> int:
+        """
+        Carrega em lote no cache os usuários ativos nos últimos dias
+
+        Args:
+            days: Janela de atividade em dias
+            limit: Máximo de usuários carregados (padrão: capacidade do cache)
+
+        Returns:
+            Quantidade de usuários carregados
+        """
+        since = (datetime.utcnow() - timedelta(days=days)).isoformat()
+        rows = self._connect().execute(
+            """
+            SELECT alexa_user_id, name, preferences FROM users
+            WHERE last_seen_at >= ?
+            ORDER BY last_seen_at DESC
+            LIMIT ?
+            """,
+            (since, limit or self.cache.capacity)
+        ).fetchall()
+
+        # Inserir do menos recente para o mais recente, mantendo os mais ativos no topo do LRU
+        users: List[User] = [self._row_to_user(row) for row in rows]
+        for user in reversed(users):
+            self.cache.put(user.user_id, user)
+
+        logger.info(f"{len(users)} usuários ativos pré-carregados no cache")
+        return len(users)
+
+
+# Instância global para uso em toda a aplicação
+user_repository = UserRepository()
+
+
+def get_user_by_id(user_id):
+    return user_repository.get_user(user_id)
@@ -4,6 +4,8 @@ import logging
 from typing import Dict, Any, Optional
 import os
 from datetime import datetime
+from requests.adapters import HTTPAdapter
+from src.tracing import tracer
 
 logger = logging.getLogger(__name__)
 
@@ -17,6 +19,32 @@ class N8NIntegration:
         self.webhook_url = os.getenv('N8N_WEBHOOK_URL', 'https://n8n-n8n.dwu3jc.easypanel.host/webhook/ec4f9b55-a8da-46ac-b8d5-5df3a4cc6847')
         self.timeout = 10  # timeout em segundos
         
+        # Sessão HTTP com pool de conexões para reaproveitar TCP/TLS entre turnos
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=int(os.getenv('N8N_POOL_SIZE', '10')))
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        
+    def _headers(self) -> Dict[str, str]:
+        """
+        Headers das requisições para o n8n, incluindo o contexto do trace atual
+        """
+        return tracer.inject_headers({'Content-Type': 'application/json'})
+    
+    def _metadata(self) -> Dict[str, Any]:
+        """
+        Metadados enviados em todos os payloads para o n8n
+        """
+        metadata = {
+            "skill_version": "1.0.0",
+            "integration_version": "1.0.0"
+        }
+        trace_context = tracer.trace_context()
+        if trace_context:
+            metadata["trace"] = trace_context
+        return metadata
+    
+    @tracer.trace()
     def send_alexa_data(self, alexa_request: Dict[str, Any], alexa_response: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         """
         Envia dados da Alexa para o n8n
@@ -33,13 +61,14 @@ class N8NIntegration:
             payload = self._prepare_payload(alexa_request, alexa_response)
             
             # Enviar para n8n
-            response = requests.post(
+            response = self.session.post(
                 self.webhook_url,
                 json=payload,
                 timeout=self.timeout,
-                headers={'Content-Type': 'application/json'}
+                headers=self._headers()
             )
             
+            tracer.current_span().set_attribute('http.status_code', response.status_code)
             response.raise_for_status()
             
             logger.info(f"Dados enviados para n8n com sucesso. Status: {response.status_code}")
@@ -79,10 +108,7 @@ class N8NIntegration:
             "user_info": user_info,
             "alexa_request": alexa_request,
             "alexa_response": alexa_response,
-            "metadata": {
-                "skill_version": "1.0.0",
-                "integration_version": "1.0.0"
-            }
+            "metadata": self._metadata()
         }
         
         return payload
@@ -144,17 +170,14 @@ class N8NIntegration:
                 "source": "alexa-skill",
                 "event_type": event_type,
                 "data": data,
-                "metadata": {
-                    "skill_version": "1.0.0",
-                    "integration_version": "1.0.0"
-                }
+                "metadata": self._metadata()
             }
             
-            response = requests.post(
+            response = self.session.post(
                 self.webhook_url,
                 json=payload,
                 timeout=self.timeout,
-                headers={'Content-Type': 'application/json'}
+                headers=self._headers()
             )
             
             response.raise_for_status()
@@ -170,6 +193,7 @@ class N8NIntegration:
             logger.error(f"Erro ao enviar evento customizado para n8n: {str(e)}")
             return None
     
+    @tracer.trace()
     def get_response_from_n8n(self, user_input: str, context: Dict[str, Any]) -> Optional[str]:
         """
         Solicita uma resposta processada pelo n8n
@@ -188,19 +212,17 @@ class N8NIntegration:
                 "action": "get_response",
                 "user_input": user_input,
                 "context": context,
-                "metadata": {
-                    "skill_version": "1.0.0",
-                    "integration_version": "1.0.0"
-                }
+                "metadata": self._metadata()
             }
             
-            response = requests.post(
+            response = self.session.post(
                 self.webhook_url,
                 json=payload,
                 timeout=self.timeout,
-                headers={'Content-Type': 'application/json'}
+                headers=self._headers()
             )
             
+            tracer.current_span().set_attribute('http.status_code', response.status_code)
             response.raise_for_status()
             
             result = response.json()
@@ -218,6 +240,64 @@ class N8NIntegration:
             logger.error(f"Erro ao obter resposta do n8n: {str(e)}")
             return None
     
+    @tracer.trace()
+    def prefetch_session(self, context: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Envia a ação 'session_start' para o n8n, aquecendo a conexão do pool e
+        permitindo que o workflow carregue o histórico antes da primeira pergunta
+        
+        Args:
+            context: Contexto da conversa (deve conter session_id)
+            
+        Returns:
+            Resultado do prefetch ou None em caso de erro
+        """
+        session_id = context.get('session_id')
+        tracer.current_span().set_attribute('alexa.session_id', session_id)
+        
+        try:
+            payload = {
+                "timestamp": datetime.utcnow().isoformat(),
+                "source": "alexa-skill",
+                "action": "session_start",
+                "context": context,
+                "metadata": self._metadata()
+            }
+            
+            response = self.session.post(
+                self.webhook_url,
+                json=payload,
+                timeout=self.timeout,
+                headers=self._headers()
+            )
+            
+            tracer.current_span().set_attribute('http.status_code', response.status_code)
+            response.raise_for_status()
+            
+            result = response.json() if response.content else {}
+            
+            logger.info(f"Prefetch da sessão {session_id} concluído")
+            return result
+            
+        except Exception as e:
+            logger.error(f"Erro no prefetch da sessão no n8n: {str(e)}")
+            return None
+    
+    def warm_connection(self) -> bool:
+        """
+        Abre a conexão TCP/TLS com o n8n e a deixa no pool, sem executar o workflow
+        (um HEAD no webhook não dispara a execução)
+        
+        Returns:
+            True se a conexão foi estabelecida, False caso contrário
+        """
+        try:
+            self.session.head(self.webhook_url, timeout=5)
+            return True
+        except Exception as e:
+            logger.warning(f"Não foi possível aquecer a conexão com o n8n: {str(e)}")
+            return False
+    
     def health_check(self) -> bool:
         """
         Verifica se o n8n está respondendo
@@ -233,11 +313,11 @@ class N8NIntegration:
                 "action": "health_check"
             }
             
-            response = requests.post(
+            response = self.session.post(
                 self.webhook_url,
                 json=payload,
                 timeout=5,
-                headers={'Content-Type': 'application/json'}
+                headers=self._headers()
             )
             
             return response.status_code == 200
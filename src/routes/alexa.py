@@ -1,7 +1,14 @@
 from flask import Blueprint, request, jsonify
+import contextvars
 import json
 import logging
-from src.services.n8n_integration import n8n_integration
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from src.n8n_integration import n8n_integration
+from src.models.session import session_prefetch_store
+from src.models.user import user_repository
+from src.tracing import tracer
 
 alexa_bp = Blueprint('alexa', __name__)
 
@@ -9,11 +16,24 @@ alexa_bp = Blueprint('alexa', __name__)
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Executor para o aquecimento assíncrono da sessão (não atrasa a resposta de boas-vindas).
+# Aquecimentos além de PREWARM_MAX_PENDING (em execução + na fila) são descartados,
+# pois chegariam tarde demais para serem úteis se o n8n estiver lento.
+prewarm_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='session-prewarm')
+prewarm_slots = threading.Semaphore(int(os.getenv('PREWARM_MAX_PENDING', '4')))
+
 @alexa_bp.route('/alexa', methods=['POST'])
 def alexa_skill():
     """
     Endpoint principal para receber requisições da Alexa
     """
+    with tracer.start_span('alexa_skill', traceparent=request.headers.get('traceparent')) as span:
+        return _process_alexa_request(span)
+
+def _process_alexa_request(span):
+    """
+    Processa a requisição da Alexa dentro do span raiz do turno
+    """
     try:
         # Obter dados da requisição
         alexa_request = request.get_json()
@@ -28,8 +48,13 @@ def alexa_skill():
         session_id = alexa_request.get('session', {}).get('sessionId')
         user_id = alexa_request.get('session', {}).get('user', {}).get('userId')
         
+        span.set_attribute('alexa.request_type', request_type)
+        span.set_attribute('alexa.intent_name', intent_name)
+        span.set_attribute('alexa.session_id', session_id)
+        
         # Processar diferentes tipos de requisição
         if request_type == 'LaunchRequest':
+            start_session_prewarm(alexa_request)
             response = handle_launch_request(alexa_request)
         elif request_type == 'IntentRequest':
             response = handle_intent_request(alexa_request, intent_name, user_input)
@@ -41,10 +66,13 @@ def alexa_skill():
         # Enviar dados para o n8n
         send_to_n8n(alexa_request, response)
         
+        logger.info(f"Requisição {request_type} processada. trace_id={span.trace_id}")
+        
         return jsonify(response)
         
     except Exception as e:
-        logger.error(f"Erro no processamento: {str(e)}")
+        span.record_exception(e)
+        logger.error(f"Erro no processamento: {str(e)} trace_id={span.trace_id}")
         error_response = create_response("Desculpe, ocorreu um erro. Tente novamente.", True)
         return jsonify(error_response)
 
@@ -57,6 +85,7 @@ def handle_launch_request(alexa_request):
     
     return create_response_with_reprompt(welcome_message, reprompt_message, False)
 
+@tracer.trace()
 def handle_intent_request(alexa_request, intent_name, user_input):
     """
     Manipula requisições de intent
@@ -84,6 +113,10 @@ def handle_session_ended_request(alexa_request):
     """
     Manipula o fim da sessão
     """
+    try:
+        session_prefetch_store.delete(alexa_request.get('session', {}).get('sessionId'))
+    except Exception as e:
+        logger.error(f"Erro ao remover prefetch da sessão: {str(e)}")
     return create_response("", True)
 
 def extract_user_text(slots):
@@ -102,12 +135,12 @@ def process_user_input(user_text, alexa_request):
         return "Não consegui entender o que você disse. Pode repetir?"
     
     # Preparar contexto da conversa
-    context = {
-        "session_id": alexa_request.get('session', {}).get('sessionId'),
-        "user_id": alexa_request.get('session', {}).get('user', {}).get('userId'),
-        "session_attributes": alexa_request.get('session', {}).get('attributes', {}),
-        "locale": alexa_request.get('request', {}).get('locale', 'pt-BR')
-    }
+    context = build_context(alexa_request)
+    
+    # Reaproveitar o resultado do prefetch feito no LaunchRequest (só na primeira pergunta)
+    session_prefetch = pop_session_prefetch(context["session_id"])
+    if session_prefetch is not None:
+        context["session_prefetch"] = session_prefetch
     
     # Tentar obter resposta do n8n
     n8n_response = n8n_integration.get_response_from_n8n(user_text, context)
@@ -118,6 +151,71 @@ def process_user_input(user_text, alexa_request):
         # Fallback caso n8n não esteja disponível
         return f"Entendi que você disse: {user_text}. Como posso ajudá-lo com isso? (Processamento avançado temporariamente indisponível)"
 
+def build_context(alexa_request):
+    """
+    Monta o contexto da conversa enviado ao n8n
+    """
+    context = {
+        "session_id": alexa_request.get('session', {}).get('sessionId'),
+        "user_id": alexa_request.get('session', {}).get('user', {}).get('userId'),
+        "session_attributes": alexa_request.get('session', {}).get('attributes', {}),
+        "locale": alexa_request.get('request', {}).get('locale', 'pt-BR')
+    }
+    context["user_preferences"] = user_repository.get_preferences(context["user_id"])
+    return context
+
+def start_session_prewarm(alexa_request):
+    """
+    Agenda o aquecimento da sessão em segundo plano: registra o acesso do
+    usuário, carrega suas preferências no cache e envia o 'session_start' ao
+    n8n pela conexão do pool
+    """
+    if not prewarm_slots.acquire(blocking=False):
+        logger.warning("Fila de aquecimento de sessões cheia, aquecimento descartado")
+        return
+
+    try:
+        # Copiar o contexto para que o span do prefetch fique no trace do LaunchRequest
+        ctx = contextvars.copy_context()
+        prewarm_executor.submit(ctx.run, prewarm_session, alexa_request)
+    except Exception as e:
+        prewarm_slots.release()
+        logger.error(f"Erro ao agendar aquecimento da sessão: {str(e)}")
+
+def prewarm_session(alexa_request):
+    """
+    Executa o aquecimento da sessão (chamada a partir do executor)
+    """
+    try:
+        mark_user_seen(alexa_request.get('session', {}).get('user', {}).get('userId'))
+        context = build_context(alexa_request)
+        result = n8n_integration.prefetch_session(context)
+        if result is not None and context["session_id"]:
+            session_prefetch_store.put(context["session_id"], result)
+    except Exception as e:
+        logger.error(f"Erro no aquecimento da sessão: {str(e)}")
+    finally:
+        prewarm_slots.release()
+
+def pop_session_prefetch(session_id):
+    """
+    Obtém e remove o prefetch da sessão, compartilhado entre os workers
+    """
+    try:
+        return session_prefetch_store.pop(session_id)
+    except Exception as e:
+        logger.error(f"Erro ao obter prefetch da sessão: {str(e)}")
+        return None
+
+def mark_user_seen(user_id):
+    """
+    Registra o acesso do usuário para o pré-carregamento de usuários ativos
+    """
+    try:
+        user_repository.mark_seen(user_id)
+    except Exception as e:
+        logger.error(f"Erro ao registrar acesso do usuário: {str(e)}")
+
 def send_to_n8n(alexa_request, alexa_response):
     """
     Envia dados para o webhook do n8n usando o serviço de integração
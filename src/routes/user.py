@@ -1,12 +1,58 @@
-from flask import Blueprint, jsonify
+import hmac
+import logging
+import os
+from flask import Blueprint, jsonify, request
+from src.models.user import user_repository, validate_preferences
 
 user_bp = Blueprint('user_bp', __name__)
 
+logger = logging.getLogger(__name__)
+
+@user_bp.before_request
+def require_api_key():
+    """
+    Exige o header X-API-Key igual a USER_API_KEY em todas as rotas de usuário
+    """
+    api_key = os.getenv('USER_API_KEY')
+    if not api_key:
+        return jsonify({"status": "error", "message": "USER_API_KEY não configurada"}), 503
+
+    provided = request.headers.get('X-API-Key', '')
+    if not hmac.compare_digest(provided.encode(), api_key.encode()):
+        return jsonify({"status": "error", "message": "Não autorizado"}), 401
+
 @user_bp.route('/profile', methods=['GET'])
 def get_user_profile():
-    return jsonify({"message": "User profile endpoint"})
+    user_id = request.args.get('user_id')
+    if not user_id:
+        return jsonify({"status": "error", "message": "user_id é obrigatório"}), 400
+
+    user = user_repository.get_user(user_id)
+    if user is None:
+        return jsonify({"status": "error", "message": "Usuário não encontrado"}), 404
+
+    return jsonify(user.to_dict())
 
 @user_bp.route('/settings', methods=['POST'])
 def update_user_settings():
-    return jsonify({"message": "User settings updated"})
+    data = request.get_json(silent=True) or {}
+    user_id = data.get('user_id')
+    preferences = data.get('preferences', {})
+
+    if not user_id:
+        return jsonify({"status": "error", "message": "user_id é obrigatório"}), 400
+    if data.get('name') is not None and not isinstance(data['name'], str):
+        return jsonify({"status": "error", "message": "name deve ser um texto"}), 400
+
+    try:
+        validate_preferences(preferences)
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+
+    try:
+        user = user_repository.update_preferences(user_id, preferences, data.get('name'))
+    except Exception as e:
+        logger.error(f"Erro ao atualizar preferências do usuário: {str(e)}")
+        return jsonify({"status": "error", "message": "Erro ao salvar as preferências"}), 500
 
+    return jsonify({"message": "User settings updated", "user": user.to_dict()})
@@ -0,0 +1,418 @@
+import contextvars
+import functools
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import re
+import threading
+import time
+from typing import Dict, Any, Optional, List
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+# Span atual da requisição (propagado automaticamente entre chamadas síncronas)
+_current_span = contextvars.ContextVar('current_span', default=None)
+
+# Formato W3C: versão-trace_id-parent_id-flags (hexadecimal minúsculo)
+_TRACEPARENT_RE = re.compile(r'^([0-9a-f]{2})-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})(-.*)?$')
+
+
+class _Trace:
+    """
+    Estado compartilhado por todos os spans de um mesmo trace
+    """
+
+    __slots__ = ('trace_id', 'sampled', 'recording', 'spans', 'root', 'finished', 'exported')
+
+    def __init__(self, trace_id: str, sampled: bool, recording: bool):
+        self.trace_id = trace_id
+        self.sampled = sampled
+        self.recording = recording
+        self.spans: List['Span'] = []
+        self.root: Optional['Span'] = None
+        self.finished = False
+        self.exported = False
+
+
+class Span:
+    """
+    Span simples com ids compatíveis com W3C Trace Context
+    """
+
+    __slots__ = ('tracer', 'trace', 'name', 'span_id', 'parent_id', 'attributes',
+                 'status', 'start_time', 'end_time', '_start', '_duration', '_token')
+
+    def __init__(self, tracer: 'Tracer', trace: _Trace, name: str, parent_id: Optional[str],
+                 attributes: Optional[Dict[str, Any]] = None):
+        self.tracer = tracer
+        self.trace = trace
+        self.name = name
+        self.span_id = '%016x' % random.getrandbits(64)
+        self.parent_id = parent_id
+        self.attributes = dict(attributes) if attributes and trace.recording else {}
+        self.status = 'OK'
+        self.start_time = time.time() if trace.recording else 0.0
+        self.end_time = 0.0
+        self._start = time.perf_counter() if trace.recording else 0.0
+        self._duration = 0.0
+        self._token = None
+
+    @property
+    def trace_id(self) -> str:
+        return self.trace.trace_id
+
+    @property
+    def duration_ms(self) -> float:
+        return self._duration * 1000
+
+    def set_attribute(self, key: str, value: Any):
+        if self.trace.recording:
+            self.attributes[key] = value
+
+    def record_exception(self, error: BaseException):
+        self.status = 'ERROR'
+        if self.trace.recording:
+            self.attributes['error.type'] = type(error).__name__
+            self.attributes['error.message'] = str(error)
+
+    def end(self):
+        if not self.trace.recording:
+            return
+        self._duration = time.perf_counter() - self._start
+        self.end_time = self.start_time + self._duration
+        # A raiz e spans em segundo plano podem terminar ao mesmo tempo em threads diferentes
+        with self.tracer._finish_lock:
+            self.trace.spans.append(self)
+            if self is self.trace.root:
+                self.tracer._finish_trace(self)
+            elif self.trace.finished:
+                # Span em segundo plano (ex.: prefetch) que terminou depois da raiz
+                self.tracer._finish_late_span(self)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_span_id": self.parent_id,
+            "name": self.name,
+            "start_time": self.start_time,
+            "end_time": self.end_time,
+            "duration_ms": round(self.duration_ms, 3),
+            "status": self.status,
+            "attributes": self.attributes
+        }
+
+    def __enter__(self) -> 'Span':
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc is not None:
+            self.record_exception(exc)
+        _current_span.reset(self._token)
+        self.end()
+        return False
+
+
+class _NoopSpan:
+    """
+    Span que não faz nada, usado quando o trace não é gravado
+    """
+
+    trace_id = None
+    span_id = None
+
+    def set_attribute(self, key: str, value: Any):
+        pass
+
+    def record_exception(self, error: BaseException):
+        pass
+
+    def end(self):
+        pass
+
+    def __enter__(self) -> '_NoopSpan':
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class SpanExporter:
+    """
+    Exporta spans em segundo plano para um arquivo JSON lines ou para um
+    coletor compatível com OTLP/HTTP (JSON), sem bloquear a requisição
+    """
+
+    def __init__(self, file_path: Optional[str] = None, otlp_endpoint: Optional[str] = None,
+                 max_bytes: int = 10 * 1024 * 1024, backup_count: int = 5):
+        self.file_path = file_path
+        self.otlp_endpoint = otlp_endpoint
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self._queue = queue.Queue(maxsize=1000)
+        self._thread = None
+        self._lock = threading.Lock()
+        self._file_logger = None
+        self._file_pid = None
+
+    def export(self, spans: List[Span]):
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait([span.to_dict() for span in spans])
+        except queue.Full:
+            logger.warning("Fila de exportação de spans cheia, trace descartado")
+
+    def _ensure_worker(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='span-exporter', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            self._export(self._queue.get())
+
+    def _export(self, spans: List[Dict[str, Any]]):
+        # Cada destino tem o seu tratamento: falha no coletor não impede a cópia local
+        if self.otlp_endpoint:
+            try:
+                self._export_otlp(spans)
+            except Exception as e:
+                logger.error(f"Erro ao exportar spans para o coletor OTLP: {str(e)}")
+        if self.file_path:
+            try:
+                self._export_file(spans)
+            except Exception as e:
+                logger.error(f"Erro ao gravar spans em arquivo: {str(e)}")
+
+    def worker_file_path(self) -> str:
+        """
+        Arquivo de spans do processo atual (ex.: logs/traces.1234.jsonl)
+
+        Cada worker do gunicorn grava e rotaciona o seu próprio arquivo, pois
+        a rotação de um mesmo arquivo por vários processos não é segura.
+        """
+        root, ext = os.path.splitext(self.file_path)
+        return f"{root}.{os.getpid()}{ext}"
+
+    def _export_file(self, spans: List[Dict[str, Any]]):
+        if self._file_logger is None or self._file_pid != os.getpid():
+            self._file_logger = self._create_file_logger()
+            self._file_pid = os.getpid()
+        for span in spans:
+            self._file_logger.info(json.dumps(span, default=str))
+
+    def _create_file_logger(self) -> logging.Logger:
+        """
+        Logger dedicado com rotação por tamanho para o arquivo de spans do processo
+        """
+        file_path = self.worker_file_path()
+        directory = os.path.dirname(file_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        handler = logging.handlers.RotatingFileHandler(
+            file_path, maxBytes=self.max_bytes, backupCount=self.backup_count, encoding='utf-8'
+        )
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        file_logger = logging.getLogger(f"{__name__}.spans.{os.getpid()}")
+        file_logger.setLevel(logging.INFO)
+        file_logger.propagate = False
+        file_logger.addHandler(handler)
+        return file_logger
+
+    def _export_otlp(self, spans: List[Dict[str, Any]]):
+        payload = {
+            "resourceSpans": [{
+                "resource": {"attributes": [
+                    {"key": "service.name", "value": {"stringValue": "alexa-skill"}}
+                ]},
+                "scopeSpans": [{
+                    "scope": {"name": "src.tracing"},
+                    "spans": [{
+                        "traceId": span["trace_id"],
+                        "spanId": span["span_id"],
+                        "parentSpanId": span["parent_span_id"] or "",
+                        "name": span["name"],
+                        "startTimeUnixNano": str(int(span["start_time"] * 1e9)),
+                        "endTimeUnixNano": str(int(span["end_time"] * 1e9)),
+                        "status": {"code": 2 if span["status"] == "ERROR" else 1},
+                        "attributes": [
+                            {"key": key, "value": {"stringValue": str(value)}}
+                            for key, value in span["attributes"].items()
+                        ]
+                    } for span in spans]
+                }]
+            }]
+        }
+        response = requests.post(self.otlp_endpoint, json=payload, timeout=5,
+                                 headers={'Content-Type': 'application/json'})
+        response.raise_for_status()
+
+
+class Tracer:
+    """
+    Tracer leve com amostragem na entrada (head) e amostragem de traces
+    lentos no final (tail)
+    """
+
+    def __init__(self):
+        self.enabled = os.getenv('TRACE_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+        # Fração dos traces exportados independentemente da duração
+        self.sample_rate = float(os.getenv('TRACE_SAMPLE_RATE', '0.01'))
+        # Traces com duração igual ou maior que este valor são sempre exportados (0 desativa)
+        self.slow_threshold_ms = float(os.getenv('TRACE_SLOW_MS', '2000'))
+        self.exporter = SpanExporter(
+            file_path=os.getenv('TRACE_FILE', os.path.join('logs', 'traces.jsonl')),
+            otlp_endpoint=os.getenv('TRACE_OTLP_ENDPOINT'),
+            max_bytes=int(os.getenv('TRACE_FILE_MAX_BYTES', str(10 * 1024 * 1024))),
+            backup_count=int(os.getenv('TRACE_FILE_BACKUPS', '5'))
+        )
+        self._finish_lock = threading.Lock()
+
+    def current_span(self):
+        """
+        Retorna o span atual (ou um span que não faz nada, se não houver)
+        """
+        return _current_span.get() or NOOP_SPAN
+
+    def start_span(self, name: str, attributes: Optional[Dict[str, Any]] = None,
+                   traceparent: Optional[str] = None) -> Span:
+        """
+        Cria um span filho do span atual ou, se não houver, a raiz de um novo trace
+
+        Args:
+            name: Nome do span
+            attributes: Atributos iniciais (ignorados quando o trace não é gravado)
+            traceparent: Header W3C recebido, usado como pai remoto do novo trace
+
+        Returns:
+            Span a ser usado como context manager
+        """
+        parent = _current_span.get()
+        if parent is not None:
+            # Filhos de um trace não gravado não custam nada: o contexto continua no pai
+            if not parent.trace.recording:
+                return NOOP_SPAN
+            return Span(self, parent.trace, name, parent.span_id, attributes)
+
+        if not self.enabled:
+            return NOOP_SPAN
+
+        remote = self._parse_traceparent(traceparent)
+        if remote:
+            trace_id, parent_id, sampled = remote
+        else:
+            trace_id = '%032x' % random.getrandbits(128)
+            parent_id = None
+            sampled = random.random() < self.sample_rate
+
+        # Traces não amostrados só são gravados se a amostragem de traces lentos estiver ativa.
+        # Caso contrário a raiz guarda apenas os ids, usados na propagação para o n8n.
+        recording = sampled or self.slow_threshold_ms > 0
+        trace = _Trace(trace_id, sampled, recording)
+        trace.root = Span(self, trace, name, parent_id, attributes)
+        return trace.root
+
+    def trace(self, name: Optional[str] = None):
+        """
+        Decorator que executa a função dentro de um span
+        """
+        def decorator(func):
+            span_name = name or func.__name__
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.start_span(span_name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def traceparent(self) -> Optional[str]:
+        """
+        Retorna o header W3C traceparent do span atual
+        """
+        span = _current_span.get()
+        if span is None:
+            return None
+        flags = '01' if span.trace.sampled else '00'
+        return f"00-{span.trace_id}-{span.span_id}-{flags}"
+
+    def inject_headers(self, headers: Dict[str, str]) -> Dict[str, str]:
+        """
+        Adiciona o contexto do trace atual aos headers HTTP
+        """
+        traceparent = self.traceparent()
+        if traceparent:
+            headers['traceparent'] = traceparent
+        return headers
+
+    def trace_context(self) -> Optional[Dict[str, Any]]:
+        """
+        Contexto do trace atual para ser incluído no payload enviado ao n8n
+        """
+        span = _current_span.get()
+        if span is None:
+            return None
+        return {
+            "trace_id": span.trace_id,
+            "span_id": span.span_id,
+            "traceparent": self.traceparent()
+        }
+
+    def _is_slow(self, span: Span) -> bool:
+        return self.slow_threshold_ms > 0 and span.duration_ms >= self.slow_threshold_ms
+
+    def _finish_trace(self, root: Span):
+        trace = root.trace
+        trace.finished = True
+        if not trace.recording:
+            return
+        slow = self._is_slow(root)
+        if trace.sampled or slow:
+            if slow:
+                root.set_attribute('sampling.reason', 'slow')
+            trace.exported = True
+            self.exporter.export(trace.spans)
+
+    def _finish_late_span(self, span: Span):
+        trace = span.trace
+        if trace.exported:
+            self.exporter.export([span])
+        elif self._is_slow(span):
+            # O trace não foi exportado na raiz, mas este span lento justifica exportá-lo
+            span.set_attribute('sampling.reason', 'slow')
+            trace.exported = True
+            self.exporter.export(trace.spans)
+
+    @staticmethod
+    def _parse_traceparent(value: Optional[str]):
+        """
+        Valida o header traceparent conforme o W3C Trace Context
+        """
+        if not value:
+            return None
+        match = _TRACEPARENT_RE.match(value.strip())
+        if not match:
+            return None
+        version, trace_id, parent_id, flags, extra = match.groups()
+        # Versão ff é inválida e a versão 00 não admite campos extras
+        if version == 'ff' or (version == '00' and extra):
+            return None
+        if trace_id == '0' * 32 or parent_id == '0' * 16:
+            return None
+        return trace_id, parent_id, bool(int(flags, 16) & 1)
+
+
+# Instância global para uso em toda a aplicação
+tracer = Tracer()
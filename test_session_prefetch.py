@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Testes do aquecimento de sessão no LaunchRequest e do prefetch compartilhado
+"""
+
+import os
+import threading
+
+import pytest
+
+import src.models.session
+import src.routes.alexa as alexa
+from src.models.session import SessionPrefetchStore
+from test_alexa_request import create_intent_request, create_launch_request
+
+SESSION_ID = "amzn1.echo-api.session.test-session-id"
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = SessionPrefetchStore(db_path=str(tmp_path / "sessions.db"), ttl=600)
+    monkeypatch.setattr(alexa, "session_prefetch_store", store)
+    return store
+
+
+@pytest.fixture
+def n8n_calls(monkeypatch):
+    """Substitui as chamadas ao n8n e registra o contexto recebido"""
+    calls = []
+
+    def get_response_from_n8n(user_input, context):
+        calls.append(context)
+        return "ok"
+
+    monkeypatch.setattr(alexa.n8n_integration, "get_response_from_n8n", get_response_from_n8n)
+    return calls
+
+
+def test_prefetch_is_consumed_exactly_once(store):
+    """Apenas um worker obtém o prefetch da sessão"""
+    other_worker = SessionPrefetchStore(db_path=store.db_path, ttl=600)
+    store.put(SESSION_ID, {"history": [1, 2]})
+
+    assert other_worker.pop(SESSION_ID) == {"history": [1, 2]}
+    assert store.pop(SESSION_ID) is None
+    assert other_worker.pop(SESSION_ID) is None
+
+
+def test_prefetch_expires_after_ttl(store, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(src.models.session.time, "time", lambda: now[0])
+    store.put(SESSION_ID, {"history": []})
+
+    now[0] += store.ttl + 1
+    assert store.pop(SESSION_ID) is None
+
+
+def test_prefetch_is_sent_only_with_first_question(store, n8n_calls):
+    store.put(SESSION_ID, {"history": ["oi"]})
+
+    alexa.handle_intent_request(create_intent_request("primeira"), "UserInputIntent",
+                                create_intent_request("primeira")["request"]["intent"]["slots"])
+    alexa.handle_intent_request(create_intent_request("segunda"), "UserInputIntent",
+                                create_intent_request("segunda")["request"]["intent"]["slots"])
+
+    assert n8n_calls[0]["session_prefetch"] == {"history": ["oi"]}
+    assert "session_prefetch" not in n8n_calls[1]
+
+
+def test_prefetch_is_deleted_on_session_ended(store, n8n_calls):
+    store.put(SESSION_ID, {"history": ["oi"]})
+    ended = create_launch_request()
+    ended["request"]["type"] = "SessionEndedRequest"
+
+    alexa.handle_session_ended_request(ended)
+
+    assert store.pop(SESSION_ID) is None
+
+
+def test_prewarm_stores_prefetch_result(store, monkeypatch):
+    monkeypatch.setattr(alexa.n8n_integration, "prefetch_session", lambda context: {"history": ["oi"]})
+
+    alexa.prewarm_session(create_launch_request())
+
+    assert store.pop(SESSION_ID) == {"history": ["oi"]}
+
+
+def test_prewarm_is_dropped_when_backlog_is_full(store, monkeypatch):
+    """Aquecimentos além de PREWARM_MAX_PENDING são descartados e as vagas são devolvidas"""
+    release = threading.Event()
+    started = []
+
+    def slow_prefetch(context):
+        started.append(context["session_id"])
+        release.wait(5)
+        return None
+
+    monkeypatch.setattr(alexa.n8n_integration, "prefetch_session", slow_prefetch)
+    monkeypatch.setattr(alexa, "prewarm_slots", threading.Semaphore(2))
+
+    futures = []
+    real_submit = alexa.prewarm_executor.submit
+    monkeypatch.setattr(alexa.prewarm_executor, "submit",
+                        lambda *args, **kwargs: futures.append(real_submit(*args, **kwargs)))
+
+    for _ in range(3):
+        alexa.start_session_prewarm(create_launch_request())
+
+    assert len(futures) == 2
+
+    release.set()
+    for future in futures:
+        future.result(timeout=5)
+
+    assert len(started) == 2
+    # As duas vagas voltaram ao semáforo
+    assert alexa.prewarm_slots.acquire(blocking=False)
+    assert alexa.prewarm_slots.acquire(blocking=False)
+    assert not alexa.prewarm_slots.acquire(blocking=False)
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([os.path.abspath(__file__), "-q"]))
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+Testes do tracer: validação do traceparent, amostragem e exportação
+"""
+
+import json
+import os
+import time
+
+import pytest
+import requests
+
+from src.tracing import Tracer, SpanExporter, NOOP_SPAN
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+PARENT_ID = "00f067aa0ba902b7"
+
+
+class CollectingExporter:
+    """Exportador que apenas guarda os spans exportados"""
+
+    def __init__(self):
+        self.batches = []
+
+    def export(self, spans):
+        self.batches.append([span.to_dict() for span in spans])
+
+    def names(self):
+        return [[span["name"] for span in batch] for batch in self.batches]
+
+
+def make_tracer(monkeypatch, sample_rate, slow_ms):
+    monkeypatch.setenv("TRACE_ENABLED", "true")
+    monkeypatch.setenv("TRACE_SAMPLE_RATE", str(sample_rate))
+    monkeypatch.setenv("TRACE_SLOW_MS", str(slow_ms))
+    tracer = Tracer()
+    tracer.exporter = CollectingExporter()
+    return tracer
+
+
+@pytest.mark.parametrize("value", [
+    f"ff-{TRACE_ID}-{PARENT_ID}-01",            # versão inválida
+    f"00-{'0' * 32}-{PARENT_ID}-01",            # trace id zerado
+    f"00-{TRACE_ID}-{'0' * 16}-01",             # parent id zerado
+    f"00-{TRACE_ID.upper()}-{PARENT_ID}-01",    # hexadecimal maiúsculo
+    f"00-{TRACE_ID}-{PARENT_ID}-01-extra",      # versão 00 com campos extras
+    f"00-{'g' * 32}-{PARENT_ID}-01",            # não hexadecimal
+    f"00-{TRACE_ID}-{PARENT_ID}",               # campos faltando
+    "",
+    None,
+])
+def test_parse_traceparent_rejects_invalid_headers(value):
+    assert Tracer._parse_traceparent(value) is None
+
+
+def test_parse_traceparent_accepts_valid_headers():
+    assert Tracer._parse_traceparent(f"00-{TRACE_ID}-{PARENT_ID}-01") == (TRACE_ID, PARENT_ID, True)
+    assert Tracer._parse_traceparent(f"00-{TRACE_ID}-{PARENT_ID}-00") == (TRACE_ID, PARENT_ID, False)
+    # Versões futuras podem ter campos extras
+    assert Tracer._parse_traceparent(f"01-{TRACE_ID}-{PARENT_ID}-01-extra") == (TRACE_ID, PARENT_ID, True)
+
+
+def test_remote_parent_is_used_for_root_span(monkeypatch):
+    tracer = make_tracer(monkeypatch, sample_rate=0, slow_ms=0)
+    with tracer.start_span("alexa_skill", traceparent=f"00-{TRACE_ID}-{PARENT_ID}-01") as root:
+        assert root.trace_id == TRACE_ID
+        assert root.parent_id == PARENT_ID
+        assert tracer.traceparent().endswith("-01")
+
+    assert tracer.exporter.names() == [["alexa_skill"]]
+
+
+def test_head_sampled_trace_is_exported(monkeypatch):
+    tracer = make_tracer(monkeypatch, sample_rate=1, slow_ms=0)
+    with tracer.start_span("alexa_skill") as root:
+        with tracer.start_span("handle_intent_request") as child:
+            assert child.parent_id == root.span_id
+            assert tracer.traceparent() == f"00-{root.trace_id}-{child.span_id}-01"
+
+    assert tracer.exporter.names() == [["handle_intent_request", "alexa_skill"]]
+
+
+def test_slow_trace_is_exported_by_tail_sampling(monkeypatch):
+    tracer = make_tracer(monkeypatch, sample_rate=0, slow_ms=1)
+    with tracer.start_span("alexa_skill"):
+        with tracer.start_span("get_response_from_n8n"):
+            time.sleep(0.005)
+
+    assert tracer.exporter.names() == [["get_response_from_n8n", "alexa_skill"]]
+    assert tracer.exporter.batches[0][1]["attributes"]["sampling.reason"] == "slow"
+
+
+def test_fast_unsampled_trace_is_recorded_but_not_exported(monkeypatch):
+    tracer = make_tracer(monkeypatch, sample_rate=0, slow_ms=10000)
+    with tracer.start_span("alexa_skill") as root:
+        child = tracer.start_span("handle_intent_request")
+        assert child is not NOOP_SPAN
+        with child:
+            pass
+        assert root.trace.recording
+
+    assert tracer.exporter.batches == []
+
+
+def test_unsampled_trace_without_tail_sampling_is_noop(monkeypatch):
+    tracer = make_tracer(monkeypatch, sample_rate=0, slow_ms=0)
+    with tracer.start_span("alexa_skill") as root:
+        assert not root.trace.recording
+        assert tracer.start_span("handle_intent_request") is NOOP_SPAN
+        # O contexto continua propagado para o n8n, marcado como não amostrado
+        assert tracer.traceparent() == f"00-{root.trace_id}-{root.span_id}-00"
+        root.set_attribute("ignored", True)
+        assert root.attributes == {}
+
+    assert tracer.exporter.batches == []
+
+
+def test_disabled_tracer_returns_noop_span(monkeypatch):
+    tracer = make_tracer(monkeypatch, sample_rate=1, slow_ms=0)
+    tracer.enabled = False
+    assert tracer.start_span("alexa_skill") is NOOP_SPAN
+    assert tracer.current_span() is NOOP_SPAN
+
+
+def test_late_child_of_exported_trace_is_exported(monkeypatch):
+    """Span em segundo plano que termina depois da raiz ainda é exportado"""
+    tracer = make_tracer(monkeypatch, sample_rate=1, slow_ms=0)
+    root = tracer.start_span("alexa_skill")
+    with root:
+        late = tracer.start_span("prefetch_session")
+    late.end()
+
+    assert tracer.exporter.names() == [["alexa_skill"], ["prefetch_session"]]
+    assert tracer.exporter.batches[1][0]["parent_span_id"] == root.span_id
+
+
+def test_slow_late_child_exports_whole_trace(monkeypatch):
+    tracer = make_tracer(monkeypatch, sample_rate=0, slow_ms=1)
+    with tracer.start_span("alexa_skill"):
+        late = tracer.start_span("prefetch_session")
+    assert tracer.exporter.batches == []
+
+    time.sleep(0.005)
+    late.end()
+
+    assert tracer.exporter.names() == [["alexa_skill", "prefetch_session"]]
+
+
+def test_fast_late_child_of_unexported_trace_is_dropped(monkeypatch):
+    tracer = make_tracer(monkeypatch, sample_rate=0, slow_ms=10000)
+    with tracer.start_span("alexa_skill"):
+        late = tracer.start_span("prefetch_session")
+    late.end()
+
+    assert tracer.exporter.batches == []
+
+
+def test_file_export_survives_collector_failure(monkeypatch, tmp_path):
+    """Falha no coletor OTLP não impede a gravação local, em arquivo por processo"""
+    exporter = SpanExporter(file_path=str(tmp_path / "traces.jsonl"), otlp_endpoint="http://collector/v1/traces")
+
+    def failing_post(*args, **kwargs):
+        raise requests.exceptions.ConnectionError("collector down")
+
+    monkeypatch.setattr(requests, "post", failing_post)
+    exporter._export([{"name": "alexa_skill", "trace_id": TRACE_ID}])
+
+    path = tmp_path / f"traces.{os.getpid()}.jsonl"
+    assert exporter.worker_file_path() == str(path)
+    assert [json.loads(line)["name"] for line in path.read_text().splitlines()] == ["alexa_skill"]
+
+
+def test_otlp_error_status_is_raised(monkeypatch):
+    class Response:
+        status_code = 503
+
+        def raise_for_status(self):
+            raise requests.exceptions.HTTPError("503 Service Unavailable")
+
+    monkeypatch.setattr(requests, "post", lambda *args, **kwargs: Response())
+    exporter = SpanExporter(otlp_endpoint="http://collector/v1/traces")
+    span = {"trace_id": TRACE_ID, "span_id": PARENT_ID, "parent_span_id": None, "name": "alexa_skill",
+            "start_time": 1.0, "end_time": 2.0, "status": "OK", "attributes": {}}
+
+    with pytest.raises(requests.exceptions.HTTPError):
+        exporter._export_otlp([span])
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([os.path.abspath(__file__), "-q"]))
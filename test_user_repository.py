@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Testes do cache LRU e do repositório de usuários em SQLite
+"""
+
+import os
+import sqlite3
+
+import pytest
+from flask import Flask
+
+import src.cache
+from src.cache import LRUCache
+from src.models.user import UserRepository, DEFAULT_PREFERENCES, validate_preferences
+
+
+class FakeClock:
+    """Relógio controlado para testar a expiração do cache"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(src.cache.time, "monotonic", fake)
+    return fake
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "users.db")
+
+
+def set_last_seen(db_path, user_id, last_seen):
+    conn = sqlite3.connect(db_path)
+    conn.execute("UPDATE users SET last_seen_at = ? WHERE alexa_user_id = ?", (last_seen, user_id))
+    conn.commit()
+    conn.close()
+
+
+def test_lru_evicts_least_recently_used():
+    """O item menos usado recentemente sai quando a capacidade é excedida"""
+    cache = LRUCache(capacity=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1  # "a" passa a ser o mais recente
+    cache.put("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert len(cache) == 2
+
+
+def test_lru_entries_expire_after_ttl(clock):
+    """Entradas expiram após o TTL"""
+    cache = LRUCache(capacity=10, ttl=30)
+    cache.put("a", 1)
+
+    clock.now += 29
+    assert cache.get("a") == 1
+
+    clock.now += 1
+    assert cache.get("a", "missing") == "missing"
+    assert len(cache) == 0
+
+
+def test_missing_user_is_cached_until_ttl(db_path, clock):
+    """Usuário inexistente fica em cache até o TTL, mesmo que outro worker o crie"""
+    repo = UserRepository(db_path=db_path, cache_ttl=30)
+    other_worker = UserRepository(db_path=db_path, cache_ttl=30)
+
+    assert repo.get_user("u1") is None
+    other_worker.update_preferences("u1", {"default_city": "Recife"})
+
+    assert repo.get_user("u1") is None
+
+    clock.now += 30
+    assert repo.get_preferences("u1")["default_city"] == "Recife"
+
+
+def test_update_preferences_writes_through_cache(db_path):
+    """update_preferences grava no SQLite e atualiza o cache sem nova leitura"""
+    repo = UserRepository(db_path=db_path, cache_ttl=30)
+    repo.update_preferences("u1", {"voice_speed": "slow"}, name="Ana")
+
+    # Remover a linha direto no banco: a leitura seguinte deve vir do cache
+    conn = sqlite3.connect(db_path)
+    conn.execute("DELETE FROM users WHERE alexa_user_id = 'u1'")
+    conn.commit()
+    conn.close()
+
+    user = repo.get_user("u1")
+    assert user.name == "Ana"
+    assert user.get_preferences()["voice_speed"] == "slow"
+
+
+def test_update_preferences_merges_from_database(db_path):
+    """A mescla usa o banco, não a cópia em cache de outro worker"""
+    repo_a = UserRepository(db_path=db_path, cache_ttl=30)
+    repo_b = UserRepository(db_path=db_path, cache_ttl=30)
+
+    repo_a.update_preferences("u1", {"voice_speed": "fast"})
+    repo_b.get_user("u1")  # cache de B com voice_speed=fast
+    repo_a.update_preferences("u1", {"default_city": "Recife"})
+    repo_b.update_preferences("u1", {"opt_outs": ["news"]})
+
+    preferences = UserRepository(db_path=db_path).get_preferences("u1")
+    assert preferences == {"voice_speed": "fast", "default_city": "Recife", "opt_outs": ["news"]}
+
+
+def test_returned_users_do_not_share_state(db_path):
+    """Alterar o usuário ou as preferências retornadas não altera o cache nem os padrões"""
+    repo = UserRepository(db_path=db_path)
+    repo.get_preferences("unknown")["opt_outs"].append("news")
+    assert DEFAULT_PREFERENCES["opt_outs"] == []
+
+    repo.update_preferences("u1", {"default_city": "Recife"})
+    repo.get_user("u1").preferences["default_city"] = "Natal"
+    assert repo.get_user("u1").preferences["default_city"] == "Recife"
+
+
+def test_preload_active_users_keeps_most_recent(db_path):
+    """O pré-carregamento traz os usuários mais ativos e os deixa no topo do LRU"""
+    writer = UserRepository(db_path=db_path)
+    for user_id, last_seen in [("old", "2026-10-01T00:00:00"),
+                               ("mid", "2026-10-10T00:00:00"),
+                               ("new", "2026-10-18T00:00:00"),
+                               ("stale", "2020-01-01T00:00:00")]:
+        writer.update_preferences(user_id, {})
+        set_last_seen(db_path, user_id, last_seen)
+
+    repo = UserRepository(db_path=db_path, cache_size=2)
+    loaded = repo.preload_active_users(days=3650)
+
+    assert loaded == 2
+    assert repo.cache.get("new") is not None
+    assert repo.cache.get("mid") is not None
+    assert repo.cache.get("old") is None
+
+    # "new" foi inserido por último, então "mid" é o primeiro a sair
+    repo = UserRepository(db_path=db_path, cache_size=2)
+    repo.preload_active_users(days=3650)
+    repo.cache.put("other", None)
+    assert repo.cache.get("mid") is None
+    assert repo.cache.get("new") is not None
+
+
+@pytest.mark.parametrize("preferences", [
+    {"theme": "dark"},
+    {"voice_speed": "turbo"},
+    {"default_city": 42},
+    {"default_city": "x" * 101},
+    {"opt_outs": "news"},
+    {"opt_outs": [1]},
+])
+def test_validate_preferences_rejects_invalid_values(preferences):
+    with pytest.raises(ValueError):
+        validate_preferences(preferences)
+
+
+def test_validate_preferences_accepts_known_values():
+    validate_preferences({"voice_speed": "x-slow", "default_city": None, "opt_outs": ["news"]})
+
+
+def test_settings_route_validates_and_hides_errors(monkeypatch, db_path):
+    """A rota rejeita preferências inválidas e não expõe erros internos"""
+    import src.routes.user as user_routes
+
+    monkeypatch.setenv("USER_API_KEY", "secret")
+    repo = UserRepository(db_path=db_path)
+    monkeypatch.setattr(user_routes, "user_repository", repo)
+
+    app = Flask(__name__)
+    app.register_blueprint(user_routes.user_bp, url_prefix="/api/user")
+    client = app.test_client()
+    headers = {"X-API-Key": "secret"}
+
+    response = client.post("/api/user/settings", headers={"X-API-Key": "wrong"}, json={"user_id": "u1"})
+    assert response.status_code == 401
+
+    response = client.post("/api/user/settings", headers=headers,
+                           json={"user_id": "u1", "preferences": {"voice_speed": "turbo"}})
+    assert response.status_code == 400
+
+    def broken(*args, **kwargs):
+        raise sqlite3.OperationalError("database is locked")
+
+    monkeypatch.setattr(repo, "update_preferences", broken)
+    response = client.post("/api/user/settings", headers=headers,
+                           json={"user_id": "u1", "preferences": {"voice_speed": "slow"}})
+    assert response.status_code == 500
+    assert "database" not in response.get_json()["message"]
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([os.path.abspath(__file__), "-q"]))